@@ -50,7 +50,7 @@ def parse_audio(audio_path):
 spectrogram = parse_audio(AUDIO_PATH)
 model = torch.load(MODEL_PATH)
 
-_, metadata = model(spectrogram.unsqueeze(0), torch.IntTensor([len(spectrogram)]), teacher_forcing_ratio=0.0)  # D(NxT)
+_, metadata = model(spectrogram.unsqueeze(0), torch.IntTensor([len(spectrogram)]), use_teacher_forcing=False)  # D(NxT)
 
 alignments = metadata[Speller.KEY_ATTN_SCORE]
 attention_maps = None
@@ -25,7 +25,7 @@ def train(opt):
 
     optimizer = optim.Adam(model.module.parameters(), lr=opt.init_lr)
     optimizer = Optimizer(optimizer, None, 0, opt.max_grad_norm)
-    criterion = nn.NLLLoss(reduction='sum', ignore_index=PAD_token).to(device)
+    criterion = nn.CrossEntropyLoss(reduction='sum', ignore_index=PAD_token).to(device)
 
     trainer = SupervisedTrainer(
         optimizer=optimizer,
@@ -40,6 +40,7 @@ def train(opt):
         device=device,
         teacher_forcing_step=opt.teacher_forcing_step,
         min_teacher_forcing_ratio=opt.min_teacher_forcing_ratio,
+        seed=opt.seed,
         print_every=opt.print_every,
         save_result_every=opt.save_result_every,
         checkpoint_every=opt.checkpoint_every
@@ -21,7 +21,7 @@ from kospeech.checkpoint.checkpoint import Checkpoint
 from kospeech.optim.lr_scheduler import RampUpLR
 from kospeech.optim.optimizer import Optimizer
 from kospeech.trainer.supervised_trainer import SupervisedTrainer
-from kospeech.model_builder import build_model
+from kospeech.model_builder import build_model, compile_model
 from kospeech.opts import print_opts, build_train_opts, build_model_opts, build_preprocess_opts
 from kospeech.utils import PAD_token, char2id, check_envirionment
 
@@ -38,6 +38,9 @@ def train(opt):
         epoch_time_step, trainset_list, validset = split_dataset(opt, audio_paths, script_paths)
         model = build_model(opt, device)
 
+        if opt.use_compile:
+            model = compile_model(model)
+
         optimizer = optim.Adam(model.module.parameters(), lr=opt.init_lr, weight_decay=1e-05)
 
         if opt.rampup_period > 0:
@@ -47,7 +50,7 @@ def train(opt):
             optimizer = Optimizer(optimizer, None, 0, opt.max_grad_norm)
 
         if opt.label_smoothing == 0.0:
-            criterion = nn.NLLLoss(reduction='sum', ignore_index=PAD_token).to(device)
+            criterion = nn.CrossEntropyLoss(reduction='sum', ignore_index=PAD_token).to(device)
         else:
             criterion = LabelSmoothingLoss(len(char2id), PAD_token, opt.label_smoothing, dim=-1).to(device)
 
@@ -72,6 +75,7 @@ def train(opt):
         device=device,
         teacher_forcing_step=opt.teacher_forcing_step,
         min_teacher_forcing_ratio=opt.min_teacher_forcing_ratio,
+        seed=opt.seed,
         print_every=opt.print_every,
         save_result_every=opt.save_result_every,
         checkpoint_every=opt.checkpoint_every
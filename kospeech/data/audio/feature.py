@@ -1,7 +1,9 @@
 import torch
 import librosa
 import platform
+import functools
 import numpy as np
+import scipy.fftpack
 
 # torchaudio is only supported on Linux
 if platform.system() == 'Linux':
@@ -10,6 +12,83 @@ if platform.system() == 'Linux':
     except ImportError:
         raise ImportError("SpectrogramPaser requires torchaudio package.")
 
+# nnAudio is optional, only required for the GPU MFCC backend
+try:
+    from nnAudio import features as nnaudio_features
+except ImportError:
+    nnaudio_features = None
+
+# numba is installed along with librosa, but Spectrogram falls back to torch ops without it
+try:
+    import numba
+except ImportError:
+    numba = None
+
+if numba is not None:
+    # Serial on purpose: AudioDataLoader threads call this concurrently, and numba's workqueue threading layer
+    # (the fallback without TBB / OpenMP) aborts on concurrent parallel regions.
+    @numba.njit(fastmath=True)
+    def _magnitude_log1p(spectrum, out):
+        """ Writes log1p(abs(spectrum)) into `out` in a single pass over the complex STFT output. """
+        for i in range(out.shape[0]):
+            for j in range(out.shape[1]):
+                out[i, j] = np.log1p(np.abs(spectrum[i, j]))
+
+
+@functools.lru_cache(maxsize=16)
+def _mel_filter_bank(sample_rate, n_fft, n_mels):
+    """ Returns (n_mels, n_fft // 2 + 1) mel filter bank, shared between instances with the same configuration. """
+    mel_fb = librosa.filters.mel(sr=sample_rate, n_fft=n_fft, n_mels=n_mels).astype(np.float32)
+    mel_fb.setflags(write=False)
+    return mel_fb
+
+
+@functools.lru_cache(maxsize=16)
+def _hamming_window(n_fft):
+    """ Returns hamming window shared between Spectrogram instances with the same n_fft. """
+    return torch.hamming_window(n_fft)
+
+
+def _batch_stft_power(signals, n_fft, hop_length, window):
+    """
+    Power spectrograms of several signals computed by a single framed rfft, as librosa.stft(center=True) does.
+
+    Returns: power, num_frames
+        - **power** (numpy.ndarray): (batch, n_fft // 2 + 1, max_frames) power spectrograms
+        - **num_frames** (list): number of valid frames of each signal
+    """
+    pad = n_fft // 2
+    num_frames = [1 + len(signal) // hop_length for signal in signals]
+
+    batch = np.zeros((len(signals), max(len(signal) for signal in signals) + (pad << 1)), dtype=np.float32)
+    for idx, signal in enumerate(signals):
+        batch[idx, pad:pad + len(signal)] = signal
+
+    frames = np.lib.stride_tricks.sliding_window_view(batch, n_fft, axis=-1)[:, ::hop_length]  # BxTxN_FFT
+    spectrum = np.fft.rfft(frames * window, axis=-1)  # BxTxF
+
+    return (np.abs(spectrum) ** 2).transpose(0, 2, 1), num_frames
+
+
+def _pad_signals(signals, reflect_pad=0, pin=False):
+    """
+    Zero-pads signals into a single batch, pinned for a non_blocking copy to GPU when `pin` is set. The first
+    `reflect_pad` samples after each signal are its reflection, as torch.stft(center=True) pads a single signal,
+    so that the last frames of shorter signals match the ones extracted signal by signal.
+
+    Returns: signals, lengths
+        - **signals** (torch.Tensor): (batch, max_signal_length + reflect_pad) padded signals
+        - **lengths** (torch.Tensor): length of each signal before padding (batch)
+    """
+    lengths = torch.LongTensor([len(signal) for signal in signals])
+    batch = torch.zeros(len(signals), int(lengths.max()) + reflect_pad)
+
+    for idx, signal in enumerate(signals):
+        signal = np.pad(np.asarray(signal, dtype=np.float32), (0, reflect_pad), mode='reflect')
+        batch[idx, :len(signal)] = torch.from_numpy(signal)
+
+    return (batch.pin_memory() if pin else batch), lengths
+
 
 class Spectrogram(object):
     """
@@ -19,27 +98,98 @@ class Spectrogram(object):
         sample_rate (int): Sample rate of audio signal. (Default: 16000)
         window_size (int): window size (ms) (Default : 20)
         stride (int): Length of hop between STFT windows. (ms) (Default: 10)
+
+    Note:
+        Returned spectrograms (of __call__ and batch_call) share memory with a scratch buffer which is reused
+        by the next call, so copy them (e.g. torch.FloatTensor) before calling this object again.
     """
     def __init__(self, sample_rate=16000, window_size=20, stride=10):
         self.sample_rate = sample_rate
         self.n_fft = int(sample_rate * 0.001 * window_size)
         self.hop_length = int(sample_rate * 0.001 * (window_size - stride))
+        self.window = _hamming_window(self.n_fft)
+        self._buf = None
 
     def __call__(self, signal):
         spectrogram = torch.stft(
-            torch.FloatTensor(signal),
+            torch.from_numpy(np.ascontiguousarray(signal, dtype=np.float32)),
             self.n_fft,
             hop_length=self.hop_length,
             win_length=self.n_fft,
-            window=torch.hamming_window(self.n_fft),
+            window=self.window,
             center=False,
             normalized=False,
-            onesided=True
+            onesided=True,
+            return_complex=True
         )
-        spectrogram = (spectrogram[:, :, 0].pow(2) + spectrogram[:, :, 1].pow(2)).pow(0.5)
-        spectrogram = np.log1p(spectrogram.numpy())
+        return self._log_magnitude(spectrogram)
+
+    def batch_call(self, signals):
+        """
+        Extracts spectrograms of several signals with a single zero-padded STFT.
+        Returns list of features, None for signals shorter than the STFT window (which __call__ can't handle either).
+        """
+        features = [None] * len(signals)
+        valid_indices = [idx for idx, signal in enumerate(signals) if len(signal) >= self.n_fft]
+
+        if len(valid_indices) == 0:
+            return features
+
+        lengths = [len(signals[idx]) for idx in valid_indices]
+        batch = torch.zeros(len(valid_indices), max(lengths))
+
+        for row, idx in enumerate(valid_indices):
+            batch[row, :lengths[row]] = torch.from_numpy(np.ascontiguousarray(signals[idx], dtype=np.float32))
+
+        spectrogram = torch.stft(
+            batch,
+            self.n_fft,
+            hop_length=self.hop_length,
+            win_length=self.n_fft,
+            window=self.window,
+            center=False,
+            normalized=False,
+            onesided=True,
+            return_complex=True
+        )
+        spectrogram = self._log_magnitude(spectrogram)
+
+        for row, idx in enumerate(valid_indices):
+            features[idx] = spectrogram[row, :, :1 + (lengths[row] - self.n_fft) // self.hop_length]
+
+        return features
+
+    def _log_magnitude(self, spectrogram):
+        """ Writes log1p(abs(spectrogram)) of a complex ([batch,] num_bins, num_frames) STFT into scratch buffer """
+        magnitude = self._get_buffer(*spectrogram.size())
+
+        if numba is not None:
+            magnitude = magnitude.numpy()
+            spectrogram = spectrogram.numpy()
 
-        return spectrogram
+            if spectrogram.ndim == 2:
+                _magnitude_log1p(spectrogram, magnitude)
+            else:
+                for row in range(spectrogram.shape[0]):
+                    _magnitude_log1p(spectrogram[row], magnitude[row])
+        else:
+            magnitude = torch.abs(spectrogram, out=magnitude).numpy()
+            np.log1p(magnitude, out=magnitude)
+
+        return magnitude
+
+    def _get_buffer(self, *size):
+        """ Returns a view of the scratch buffer with the given size, growing the buffer when it is too small. """
+        numel = int(np.prod(size))
+
+        if self._buf is None or self._buf.numel() < numel:
+            self._buf = torch.empty(numel)
+
+        return self._buf[:numel].view(*size)
+
+    def reset_buffers(self):
+        """ Releases the scratch buffer (e.g. between epochs, after a batch padded to a long outlier utterance). """
+        self._buf = None
 
 
 class MelSpectrogram(object):
@@ -52,45 +202,91 @@ class MelSpectrogram(object):
         window_size (int): window size (ms) (Default : 20)
         stride (int): Length of hop between STFT windows. (ms) (Default: 10)
         feature_extract_by (str): which library to use for feature extraction(default: librosa)
+        device (torch.device): device on which torchaudio transforms run (default: cpu)
     """
-    def __init__(self, sample_rate=16000, n_mels=80, window_size=20, stride=10, feature_extract_by='librosa'):
+    def __init__(self, sample_rate=16000, n_mels=80, window_size=20, stride=10,
+                 feature_extract_by='librosa', device='cpu'):
         self.sample_rate = sample_rate
         self.n_mels = n_mels
         self.n_fft = int(sample_rate * 0.001 * window_size)
         self.hop_length = int(sample_rate * 0.001 * stride)
         self.feature_extract_by = feature_extract_by.lower()
+        self.device = device
 
-        if self.feature_extract_by == 'torchaudio':
+        if self.feature_extract_by == 'librosa':
+            self.mel_fb = _mel_filter_bank(sample_rate, self.n_fft, n_mels)
+            self.stft_window = librosa.filters.get_window('hann', self.n_fft, fftbins=True).astype(np.float32)
+
+        elif self.feature_extract_by == 'torchaudio':
             self.transforms = torchaudio.transforms.MelSpectrogram(
                 sample_rate=sample_rate,
-                win_length=window_size,
+                win_length=self.n_fft,
                 hop_length=self.hop_length,
                 n_fft=self.n_fft,
                 n_mels=n_mels
-            )
-            self.amplitude_to_db = torchaudio.transforms.AmplitudeToDB()
+            ).to(device)
+            self.amplitude_to_db = torchaudio.transforms.AmplitudeToDB().to(device)
 
     def __call__(self, signal):
         if self.feature_extract_by == 'torchaudio':
-            melspectrogram = self.transforms(torch.FloatTensor(signal))
+            signal = torch.from_numpy(np.ascontiguousarray(signal, dtype=np.float32))
+            melspectrogram = self.transforms(signal.to(self.device))
             melspectrogram = self.amplitude_to_db(melspectrogram)
-            melspectrogram = melspectrogram.numpy()
+            melspectrogram = melspectrogram.cpu().numpy()
 
         elif self.feature_extract_by == 'librosa':
-            melspectrogram = librosa.feature.melspectrogram(
-                y=signal,
-                sr=self.sample_rate,
-                n_mels=self.n_mels,
-                n_fft=self.n_fft,
-                hop_length=self.hop_length
-            )
-            melspectrogram = librosa.amplitude_to_db(melspectrogram, ref=np.max)
+            power = np.abs(librosa.stft(signal, n_fft=self.n_fft, hop_length=self.hop_length)) ** 2
+            melspectrogram = librosa.amplitude_to_db(np.dot(self.mel_fb, power), ref=np.max)
 
         else:
             raise ValueError("Unsupported library : {0}".format(self.feature_extract_by))
 
         return melspectrogram
 
+    def batch_call(self, signals):
+        """
+        Extracts mel spectrograms of several signals with a single STFT and mel projection. Returns list.
+        torchaudio features are tensors left on `self.device`, librosa features are numpy arrays.
+        """
+        if self.feature_extract_by == 'torchaudio':
+            signals, lengths = _pad_signals(signals, self.n_fft // 2, pin=str(self.device) != 'cpu')
+            with torch.no_grad():
+                melspectrograms, feature_lengths = self.forward_batch(signals, lengths)
+            return [melspectrogram[:, :length]
+                    for melspectrogram, length in zip(melspectrograms, feature_lengths.tolist())]
+
+        elif self.feature_extract_by != 'librosa':
+            raise ValueError("Unsupported library : {0}".format(self.feature_extract_by))
+
+        power, num_frames = _batch_stft_power(signals, self.n_fft, self.hop_length, self.stft_window)
+        melspectrograms = np.einsum('mf,bft->bmt', self.mel_fb, power)
+
+        return [librosa.amplitude_to_db(melspectrogram[:, :length], ref=np.max)
+                for melspectrogram, length in zip(melspectrograms, num_frames)]
+
+    def forward_batch(self, signals, lengths):
+        """
+        Extracts mel spectrograms from a padded batch of signals in a single torchaudio call (see batch_call()).
+
+        Args:
+            signals (torch.Tensor): padded batch of raw signals (batch, max_signal_length)
+            lengths (torch.Tensor): length of each signal before padding (batch)
+
+        Returns: melspectrograms, feature_lengths
+            - **melspectrograms** (torch.Tensor): (batch, n_mels, max_frames) on `self.device`
+            - **feature_lengths** (torch.Tensor): number of valid frames per signal (batch)
+        """
+        if self.feature_extract_by != 'torchaudio':
+            raise ValueError("forward_batch() requires torchaudio feature extraction")
+
+        non_blocking = signals.is_pinned()
+        signals = signals.to(self.device, non_blocking=non_blocking)
+
+        melspectrograms = self.amplitude_to_db(self.transforms(signals))
+        feature_lengths = lengths // self.hop_length + 1  # torchaudio pads signals with center=True
+
+        return melspectrograms, feature_lengths
+
 
 class MFCC(object):
     """
@@ -102,39 +298,98 @@ class MFCC(object):
         window_size (int): window size (ms) (Default : 20)
         stride (int): Length of hop between STFT windows. (ms) (Default: 10)
         feature_extract_by (str): which library to use for feature extraction(default: librosa)
+        device (torch.device): device on which torchaudio / nnaudio transforms run (default: cpu)
     """
-    def __init__(self, sample_rate=16000, n_mfcc=40, window_size=20, stride=10, feature_extract_by='librosa'):
+    def __init__(self, sample_rate=16000, n_mfcc=40, window_size=20, stride=10,
+                 feature_extract_by='librosa', device='cpu'):
         self.sample_rate = sample_rate
         self.n_mfcc = n_mfcc
         self.n_fft = int(sample_rate * 0.001 * window_size)
         self.hop_length = int(sample_rate * 0.001 * stride)
         self.feature_extract_by = feature_extract_by.lower()
+        self.device = device
 
-        if self.feature_extract_by == 'torchaudio':
+        if self.feature_extract_by == 'librosa':
+            self.mel_fb = _mel_filter_bank(sample_rate, self.n_fft, 128)  # librosa.feature.mfcc() uses 128 mels
+            self.stft_window = librosa.filters.get_window('hann', self.n_fft, fftbins=True).astype(np.float32)
+
+        elif self.feature_extract_by == 'torchaudio':
             self.transforms = torchaudio.transforms.MFCC(
                 sample_rate=sample_rate,
                 n_mfcc=n_mfcc,
                 log_mels=True,
-                win_length=window_size,
+                melkwargs={'win_length': self.n_fft, 'hop_length': self.hop_length, 'n_fft': self.n_fft}
+            ).to(device)
+
+        elif self.feature_extract_by == 'nnaudio':
+            if nnaudio_features is None:
+                raise ImportError("MFCC with feature_extract_by='nnaudio' requires nnAudio package.")
+            # STFT kernels and DCT matrix are built once here as fixed weights of the module
+            self.transforms = nnaudio_features.MFCC(
+                sr=sample_rate,
+                n_mfcc=n_mfcc,
+                n_fft=self.n_fft,
                 hop_length=self.hop_length,
-                n_fft=self.n_fft
-            )
+                verbose=False
+            ).to(device)
 
     def __call__(self, signal):
-        if self.feature_extract_by == 'torchaudio':
-            mfcc = self.transforms(torch.FloatTensor(signal))
-            mfcc = mfcc.numpy()
+        if self.feature_extract_by in ('torchaudio', 'nnaudio'):
+            signal = torch.from_numpy(np.ascontiguousarray(signal, dtype=np.float32))
+            with torch.no_grad():
+                mfcc = self.transforms(signal.to(self.device))
+            mfcc = mfcc.squeeze(0).cpu().numpy()  # nnAudio always returns (batch, n_mfcc, time)
 
         elif self.feature_extract_by == 'librosa':
-            mfcc = librosa.feature.mfcc(
-                y=signal,
-                sr=self.sample_rate,
-                n_mfcc=self.n_mfcc,
-                n_fft=self.n_fft,
-                hop_length=self.hop_length
-            )
+            power = np.abs(librosa.stft(signal, n_fft=self.n_fft, hop_length=self.hop_length)) ** 2
+            log_mel = librosa.power_to_db(np.dot(self.mel_fb, power))
+            mfcc = scipy.fftpack.dct(log_mel, axis=0, type=2, norm='ortho')[:self.n_mfcc]
 
         else:
             raise ValueError("Unsupported library : {0}".format(self.feature_extract_by))
 
         return mfcc
+
+    def batch_call(self, signals):
+        """
+        Extracts MFCCs of several signals with a single STFT and mel projection. Returns list.
+        torchaudio / nnaudio features are tensors left on `self.device`, librosa features are numpy arrays.
+        """
+        if self.feature_extract_by in ('torchaudio', 'nnaudio'):
+            signals, lengths = _pad_signals(signals, self.n_fft // 2, pin=str(self.device) != 'cpu')
+            with torch.no_grad():
+                mfccs, feature_lengths = self.forward_batch(signals, lengths)
+            return [mfcc[:, :length] for mfcc, length in zip(mfccs, feature_lengths.tolist())]
+
+        elif self.feature_extract_by != 'librosa':
+            raise ValueError("Unsupported library : {0}".format(self.feature_extract_by))
+
+        power, num_frames = _batch_stft_power(signals, self.n_fft, self.hop_length, self.stft_window)
+        mels = np.einsum('mf,bft->bmt', self.mel_fb, power)
+        log_mels = [librosa.power_to_db(mel[:, :length]) for mel, length in zip(mels, num_frames)]
+
+        return [scipy.fftpack.dct(log_mel, axis=0, type=2, norm='ortho')[:self.n_mfcc] for log_mel in log_mels]
+
+    def forward_batch(self, signals, lengths):
+        """
+        Extracts MFCCs from a padded batch of signals in a single call, keeping them on `self.device`
+        (see batch_call()).
+
+        Args:
+            signals (torch.Tensor): padded batch of raw signals (batch, max_signal_length)
+            lengths (torch.Tensor): length of each signal before padding (batch)
+
+        Returns: mfccs, feature_lengths
+            - **mfccs** (torch.Tensor): (batch, n_mfcc, max_frames) on `self.device`
+            - **feature_lengths** (torch.Tensor): number of valid frames per signal (batch)
+        """
+        if self.feature_extract_by not in ('torchaudio', 'nnaudio'):
+            raise ValueError("forward_batch() requires torchaudio or nnaudio feature extraction")
+
+        non_blocking = signals.is_pinned()
+        signals = signals.to(self.device, non_blocking=non_blocking)
+
+        mfccs = self.transforms(signals)
+        feature_lengths = lengths // self.hop_length + 1  # both backends pad signals with center=True
+
+        return mfccs, feature_lengths
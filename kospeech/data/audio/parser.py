@@ -38,6 +38,7 @@ class SpectrogramParser(AudioParser):
         window_size (int): window size (ms) (Default : 20)
         stride (int): Length of hop between STFT windows. (ms) (Default: 10)
         feature_extract_by (str): which library to use for feature extraction(default: librosa)
+        device (torch.device): device on which torchaudio / nnaudio features are extracted (default: cpu)
         del_silence (bool): flag indication whether to delete silence or not (default: True)
         input_reverse (bool): flag indication whether to reverse input or not (default: True)
         normalize (bool): flag indication whether to normalize spectrum or not (default:True)
@@ -57,7 +58,7 @@ class SpectrogramParser(AudioParser):
                  del_silence=False, input_reverse=True, normalize=False, feature='mel',
                  time_mask_para=70, freq_mask_para=12, time_mask_num=2, freq_mask_num=2,
                  sos_id=1, eos_id=2, target_dict=None,
-                 noise_augment=False, dataset_path=None, noiseset_size=0, noise_level=0.7):
+                 noise_augment=False, dataset_path=None, noiseset_size=0, noise_level=0.7, device='cpu'):
         super(SpectrogramParser, self).__init__(dataset_path, noiseset_size, sample_rate, noise_level, noise_augment)
         self.del_silence = del_silence
         self.input_reverse = input_reverse
@@ -67,10 +68,13 @@ class SpectrogramParser(AudioParser):
         self.target_dict = target_dict
         self.spec_augment = SpecAugment(time_mask_para, freq_mask_para, time_mask_num, freq_mask_num)
 
+        if str(device) != 'cpu' and (feature.lower() == 'spect' or feature_extract_by.lower() == 'librosa'):
+            raise ValueError("GPU feature extraction requires mel / mfcc feature by torchaudio or nnaudio")
+
         if feature.lower() == 'mel':
-            self.transforms = MelSpectrogram(sample_rate, n_mels, window_size, stride, feature_extract_by)
+            self.transforms = MelSpectrogram(sample_rate, n_mels, window_size, stride, feature_extract_by, device)
         elif feature.lower() == 'mfcc':
-            self.transforms = MFCC(sample_rate, n_mels, window_size, stride, feature_extract_by)
+            self.transforms = MFCC(sample_rate, n_mels, window_size, stride, feature_extract_by, device)
         elif feature.lower() == 'spect':
             self.transforms = Spectrogram(sample_rate, window_size, stride)
         else:
@@ -87,21 +91,68 @@ class SpectrogramParser(AudioParser):
         Returns: feature
             - **feature** (torch.FloatTensor): feature from audio file.
         """
+        signal = self.load_signal(audio_path, augment_method)
+        feature_vector = self.transforms(signal)
+
+        return self.postprocess(feature_vector, augment_method)
+
+    def parse_audios(self, audio_paths, augment_methods):
+        """
+        Parses several audio files, extracting their features with a single batch_call() of the transform.
+
+        Args:
+             audio_paths (list): paths of audio files
+             augment_methods (list): flags indication which augmentation method to use for each file.
+
+        Returns: features
+            - **features** (list): features from audio files. None for audio files which failed to load
+              or are too short for the transform.
+        """
+        features = [None] * len(audio_paths)
+        signals = [self.load_signal(audio_path, augment_method)
+                   for audio_path, augment_method in zip(audio_paths, augment_methods)]
+        valid_indices = [idx for idx, signal in enumerate(signals) if signal is not None]
+
+        if len(valid_indices) == 0:
+            return features
+
+        feature_vectors = self.transforms.batch_call([signals[idx] for idx in valid_indices])
+
+        for idx, feature_vector in zip(valid_indices, feature_vectors):
+            if feature_vector is not None:
+                features[idx] = self.postprocess(feature_vector, augment_methods[idx])
+
+        return features
+
+    def reset_buffers(self):
+        """ Releases scratch buffers of the transform, if it keeps any (Spectrogram, grown by parse_audios()). """
+        if isinstance(self.transforms, Spectrogram):
+            self.transforms.reset_buffers()
+
+    def load_signal(self, audio_path, augment_method):
+        """ Loads signal of audio file and injects noise if needed. """
         signal = load_audio(audio_path, self.del_silence)
 
-        if augment_method == SpectrogramParser.NOISE_INJECTION:
+        if signal is not None and augment_method == SpectrogramParser.NOISE_INJECTION:
             signal = self.noise_injector(signal)
 
-        feature_vector = self.transforms(signal)
+        return signal
+
+    def postprocess(self, feature_vector, augment_method):
+        """
+        Normalizes, reverses & augments feature, and converts it into (seq_len, feature_size) tensor.
+        numpy features are copied into a new tensor, tensor features stay on their device.
+        """
+        if isinstance(feature_vector, np.ndarray):
+            feature_vector = torch.tensor(feature_vector, dtype=torch.float)
 
         if self.normalize:
             feature_vector -= feature_vector.mean()
 
         if self.input_reverse:  # Refer to "Sequence to Sequence Learning with Neural Network" paper
-            feature_vector = feature_vector[:, ::-1]
-            feature_vector = torch.FloatTensor(np.ascontiguousarray(np.swapaxes(feature_vector, 0, 1)))
-        else:
-            feature_vector = torch.FloatTensor(feature_vector).transpose(0, 1)
+            feature_vector = feature_vector.flip(1)
+
+        feature_vector = feature_vector.transpose(0, 1)
 
         if augment_method == SpectrogramParser.SPEC_AUGMENT:
             feature_vector = self.spec_augment(feature_vector)
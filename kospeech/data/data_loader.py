@@ -33,7 +33,8 @@ class SpectrogramDataset(Dataset, SpectrogramParser):
                                                  time_mask_num=opt.time_mask_num, freq_mask_num=opt.freq_mask_num,
                                                  sos_id=sos_id, eos_id=eos_id, dataset_path=dataset_path,
                                                  noiseset_size=noiseset_size, noise_level=noise_level,
-                                                 noise_augment=noise_augment, feature=opt.feature)
+                                                 noise_augment=noise_augment, feature=opt.feature,
+                                                 device=get_feature_device(opt))
         self.audio_paths = list(audio_paths)
         self.script_paths = list(script_paths)
         self.augment_methods = [self.VANILLA] * len(self.audio_paths)
@@ -41,15 +42,13 @@ class SpectrogramDataset(Dataset, SpectrogramParser):
         self.augmentation(spec_augment, noise_augment)
         self.shuffle()
 
-    def get_item(self, idx):
-        """ get feature & transcript """
-        transcript = self.parse_transcript(self.script_paths[idx])
-        feature = self.parse_audio(self.audio_paths[idx], self.augment_methods[idx])
+    def get_items(self, indices):
+        """ get features & transcripts, extracting features of the whole batch at once """
+        transcripts = [self.parse_transcript(self.script_paths[idx]) for idx in indices]
+        features = self.parse_audios([self.audio_paths[idx] for idx in indices],
+                                     [self.augment_methods[idx] for idx in indices])
 
-        if feature is None:
-            return None, None
-        else:
-            return feature, transcript
+        return [(feature, transcript) for feature, transcript in zip(features, transcripts) if feature is not None]
 
     def parse_transcript(self, script_path):
         """ Parses scripts @Override """
@@ -132,18 +131,9 @@ class AudioDataLoader(threading.Thread):
         logger.debug('loader %d start' % self.thread_id)
 
         while True:
-            items = list()
-
-            for _ in range(self.batch_size):
-                if self.index >= self.dataset_count:
-                    break
-
-                spectrogram, transcript = self.dataset.get_item(self.index)
-
-                if spectrogram is not None:
-                    items.append((spectrogram, transcript))
-
-                self.index += 1
+            indices = range(self.index, min(self.index + self.batch_size, self.dataset_count))
+            items = self.dataset.get_items(indices)
+            self.index += len(indices)
 
             if len(items) == 0:
                 batch = self.create_empty_batch()
@@ -182,7 +172,7 @@ def _collate_fn(batch):
     feat_size = max_seq_sample.size(1)
     batch_size = len(batch)
 
-    seqs = torch.zeros(batch_size, max_seq_size, feat_size)
+    seqs = max_seq_sample.new_zeros(batch_size, max_seq_size, feat_size)  # on GPU with --feature_on_gpu
 
     targets = torch.zeros(batch_size, max_target_size).to(torch.long)
     targets.fill_(PAD_token)
@@ -231,6 +221,13 @@ class MultiDataLoader(object):
             self.loader[idx].join()
 
 
+def get_feature_device(opt):
+    """ Returns the device on which the datasets extract features, cuda only with --feature_on_gpu """
+    if opt.feature_on_gpu and opt.use_cuda and torch.cuda.is_available():
+        return torch.device('cuda')
+    return torch.device('cpu')
+
+
 def split_dataset(opt, audio_paths, script_paths):
     """
     split into training set and validation set.
@@ -36,9 +36,9 @@ class BasicEnsemble(Ensemble):
         with torch.no_grad():
             for model in self.models:
                 if hypothesis is None:
-                    hypothesis = model(inputs, input_lengths, teacher_forcing_ratio=0.0)
+                    hypothesis = model(inputs, input_lengths, use_teacher_forcing=False)
                 else:
-                    hypothesis += model(inputs, input_lengths, teacher_forcing_ratio=0.0)
+                    hypothesis += model(inputs, input_lengths, use_teacher_forcing=False)
 
         return hypothesis
 
@@ -67,7 +67,7 @@ class WeightedEnsemble(Ensemble):
         # model`s parameters are fixed
         with torch.no_grad():
             for model in self.models:
-                outputs.append(model(inputs, input_lengths, teacher_forcing_ratio=0.0))
+                outputs.append(model(inputs, input_lengths, use_teacher_forcing=False))
 
         weights = self.meta_classifier(weights)
 
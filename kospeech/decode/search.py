@@ -38,9 +38,10 @@ class GreedySearch(object):
                 targets = scripts[:, 1:]
 
                 output, _ = model(inputs=inputs, input_lengths=input_lengths,
-                                  teacher_forcing_ratio=0.0, language_model=self.language_model)
+                                  use_teacher_forcing=False, language_model=self.language_model)
 
-                logit = torch.stack(output, dim=1).to(device)
+                logit = output if isinstance(output, torch.Tensor) else torch.stack(output, dim=1)
+                logit = logit.to(device)
                 hypothesis = logit.max(-1)[1]
 
                 for idx in range(targets.size(0)):
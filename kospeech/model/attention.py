@@ -46,9 +46,12 @@ class MultiHeadAttention(nn.Module):
         hidden_dim (int): The number of expected features in the output
         num_heads (int): The number of heads. (default: )
 
-    Inputs: query, value
+    Inputs: query, key, value, projected
         - **query** (batch, q_len, hidden_dim): tensor containing the output features from the decoder.
+        - **key** (batch, k_len, hidden_dim): tensor containing features of the encoded input sequence.
         - **value** (batch, v_len, hidden_dim): tensor containing features of the encoded input sequence.
+        - **projected** (bool): flag indication whether key & value are already returned by project_key_value()
+          (batch * num_heads, k_len, d_head). Step-by-step decoders project them once per utterance.
 
     Returns: context
         - **context** (batch, output_len, dimensions): tensor containing the attended output features from the decoder.
@@ -73,25 +76,36 @@ class MultiHeadAttention(nn.Module):
         self.linear_k = Linear(hidden_dim, self.d_head * num_heads)
         self.linear_v = Linear(hidden_dim, self.d_head * num_heads)
 
-    def forward(self, query: Tensor, key: Tensor, value: Tensor) -> Tuple[Tensor, Tensor]:
-        batch_size = value.size(0)
+    def forward(self, query: Tensor, key: Tensor, value: Tensor, projected: bool = False) -> Tuple[Tensor, Tensor]:
+        batch_size = query.size(0)
         residual = query
 
-        query = self.linear_q(query).view(batch_size, -1, self.num_heads, self.d_head)  # BxQ_LENxNxD
-        key = self.linear_k(key).view(batch_size, -1, self.num_heads, self.d_head)      # BxK_LENxNxD
-        value = self.linear_v(value).view(batch_size, -1, self.num_heads, self.d_head)  # BxV_LENxNxD
+        if not projected:
+            key, value = self.project_key_value(key, value)
 
+        query = self.linear_q(query).view(batch_size, -1, self.num_heads, self.d_head)  # BxQ_LENxNxD
         query = query.permute(2, 0, 1, 3).contiguous().view(batch_size * self.num_heads, -1, self.d_head)  # BNxQ_LENxD
-        key = key.permute(2, 0, 1, 3).contiguous().view(batch_size * self.num_heads, -1, self.d_head)      # BNxK_LENxD
-        value = value.permute(2, 0, 1, 3).contiguous().view(batch_size * self.num_heads, -1, self.d_head)  # BNxV_LENxD
 
-        context, attn = self.scaled_dot_attn(query, key, value)
-        context = context.view(self.num_heads, batch_size, -1, self.d_head)
+        # key & value may be cached in half precision
+        context, attn = self.scaled_dot_attn(query.to(key.dtype), key, value)
+        context = context.to(residual.dtype).view(self.num_heads, batch_size, -1, self.d_head)
 
         context = context.permute(1, 2, 0, 3).contiguous().view(batch_size, -1, self.num_heads * self.d_head)  # BxTxND
         context = torch.cat((context, residual), dim=2)
 
-        return context, attn
+        return context, attn.to(residual.dtype)
+
+    def project_key_value(self, key: Tensor, value: Tensor) -> Tuple[Tensor, Tensor]:
+        """ Projects key & value and splits them into heads: BxK_LENxND => BNxK_LENxD """
+        batch_size = value.size(0)
+
+        key = self.linear_k(key).view(batch_size, -1, self.num_heads, self.d_head)      # BxK_LENxNxD
+        value = self.linear_v(value).view(batch_size, -1, self.num_heads, self.d_head)  # BxV_LENxNxD
+
+        key = key.permute(2, 0, 1, 3).contiguous().view(batch_size * self.num_heads, -1, self.d_head)      # BNxK_LENxD
+        value = value.permute(2, 0, 1, 3).contiguous().view(batch_size * self.num_heads, -1, self.d_head)  # BNxV_LENxD
+
+        return key, value
 
 
 class LocationAwareAttention(nn.Module):
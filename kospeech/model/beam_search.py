@@ -43,8 +43,9 @@ class BeamSearchDecoder(nn.Module):
         self.alpha = 1.2
         self.device = decoder.device
 
-    def forward(self, input_var: Tensor, encoder_outputs: Tensor, teacher_forcing_ratio: float = 0.0) -> list:
-        inputs, batch_size, max_length = self.validate_args(input_var, encoder_outputs, 0.0)
+    def forward(self, input_var: Tensor, encoder_outputs: Tensor, use_teacher_forcing: bool = False,
+                language_model=None) -> list:
+        inputs, batch_size, max_length = self.validate_args(input_var, encoder_outputs, False, None)
         self.pos_index = (LongTensor(range(batch_size)) * self.beam_size).view(-1, 1).to(self.device)
 
         hidden, attn = None, None
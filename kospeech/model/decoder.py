@@ -1,7 +1,7 @@
-import random
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from collections import OrderedDict
 from torch import Tensor, LongTensor
 from kospeech.model.base_rnn import BaseRNN
 from typing import Optional, Any, Tuple
@@ -9,6 +9,28 @@ from kospeech.model.attention import LocationAwareAttention, MultiHeadAttention
 from kospeech.model.modules import Linear, LayerNorm
 
 
+@torch.compiler.assume_constant_result
+def _bf16_supported():
+    """
+    bfloat16 keeps float32's exponent range, so the output projection can run on tensor cores without loss scaling.
+    Checked at CUDA forwards rather than on import, because the check initializes a CUDA context.
+    torch.compile evaluates it once while tracing instead of breaking the graph.
+    """
+    return torch.cuda.is_bf16_supported()
+
+
+def _clone_states(states: tuple) -> tuple:
+    return tuple(_clone_states(state) if isinstance(state, tuple) else state.clone() for state in states)
+
+
+def _copy_states(dst: tuple, src: tuple) -> None:
+    for d, s in zip(dst, src):
+        if isinstance(d, tuple):
+            _copy_states(d, s)
+        else:
+            d.copy_(s)
+
+
 class Speller(BaseRNN):
     """
     Converts higher level features (from listener) into output utterances
@@ -25,24 +47,25 @@ class Speller(BaseRNN):
         dropout_p (float, optional): dropout probability (default: 0)
         device (torch.device): device - 'cuda' or 'cpu'
 
-    Inputs: inputs, encoder_outputs, teacher_forcing_ratio
+    Inputs: inputs, encoder_outputs, use_teacher_forcing
         - **inputs** (batch, seq_len, input_size): list of sequences, whose length is the batch size and within which
           each sequence is a list of token IDs.  It is used for teacher forcing when provided. (default `None`)
         - **encoder_outputs** (batch, seq_len, hidden_dim): tensor with containing the outputs of the listener.
           Used for attention mechanism (default is `None`).
-        - **teacher_forcing_ratio** (float): The probability that teacher forcing will be used. A random number is
-          drawn uniformly from 0-1 for every decoding token, and if the sample is smaller than the given value,
-          teacher forcing would be used (default is 0).
+        - **use_teacher_forcing** (bool): flag indication whether to use teacher forcing or not. It is sampled with
+          teacher forcing ratio by the caller, not by the model, to keep python RNG out of the forward pass.
 
     Returns: decoder_outputs, ret_dict
-        - **decoder_outputs** (seq_len, batch, num_classes): list of tensors containing
-          the outputs of the decoding function.
+        - **decoder_outputs** (batch, seq_len, num_classes): tensor containing the outputs of the decoding function.
+          Outputs are logits in training mode and log probabilities in evaluation mode.
+          In inference, decoding stops once every sequence emitted eos and the remaining steps repeat the last output.
         - **ret_dict**: dictionary containing additional information as follows {*KEY_ATTENTION_SCORE* : list of scores
           representing encoder outputs, *KEY_SEQUENCE_SYMBOL* : list of sequences, where each sequence is a list of
           predicted token IDs }.
     """
     KEY_ATTENTION_SCORE = 'attention_score'
     KEY_SEQUENCE_SYMBOL = 'sequence_symbol'
+    MAX_CUDA_GRAPHS = 8  # graphs hold on to their memory pools
 
     def __init__(self, num_classes: int, max_length: int = 120, hidden_dim: int = 1024,
                  sos_id: int = 1, eos_id: int = 2, attn_mechanism: str = 'dot',
@@ -70,86 +93,268 @@ class Speller(BaseRNN):
         self.linear1 = Linear(hidden_dim << 1, hidden_dim, bias=True)
         self.layer_norm = LayerNorm(hidden_dim)
         self.linear2 = Linear(hidden_dim, num_classes, bias=True)
+        self._cuda_graphs = OrderedDict()
+
+    def __getstate__(self):
+        # checkpoints pickle the whole model, captured CUDA graphs can't be pickled
+        state = self.__dict__.copy()
+        state['_cuda_graphs'] = OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        super(Speller, self).__setstate__(state)
+        self.__dict__.setdefault('_cuda_graphs', OrderedDict())
 
     def forward_step(self, input_var: Tensor, hidden: Optional[Any],
                      encoder_outputs: Tensor, attn: Tensor) -> Tuple[Tensor, Optional[Any], Tensor]:
-        batch_size, output_lengths = input_var.size(0), input_var.size(1)
+        embedded = self.input_dropout(self.embedding(input_var))
+        return self.embedded_step(embedded, hidden, encoder_outputs, attn)
 
-        embedded = self.embedding(input_var).to(self.device)
-        embedded = self.input_dropout(embedded)
-
-        if self.training:
-            self.rnn.flatten_parameters()
+    def embedded_step(self, embedded: Tensor, hidden: Optional[Any],
+                      encoder_outputs: Tensor, attn: Tensor) -> Tuple[Tensor, Optional[Any], Tensor]:
+        """ forward_step() for inputs which are already embedded (batch, seq_len, hidden_dim). """
+        batch_size, output_lengths = embedded.size(0), embedded.size(1)
 
         output, hidden = self.rnn(embedded, hidden)
 
-        if self.attn_mechanism == 'dot':
+        if self.attn_mechanism == 'dot' and isinstance(encoder_outputs, tuple):
+            context, attn = self.attention(output, *encoder_outputs, projected=True)
+        elif self.attn_mechanism == 'dot':
             context, attn = self.attention(output, encoder_outputs, encoder_outputs)
         else:
             context, attn = self.attention(output, encoder_outputs, attn)
 
-        output = self.linear1(context.view(-1, self.hidden_dim << 1)).view(batch_size, -1, self.hidden_dim)
-        output = self.linear2(self.layer_norm(output).contiguous().view(-1, self.hidden_dim))
+        with torch.autocast('cuda', dtype=torch.bfloat16, enabled=context.is_cuda and _bf16_supported()):
+            output = self.linear2(self.layer_norm(self.linear1(context)))
 
-        predicted_softmax = F.log_softmax(output, dim=1)
-        step_output = predicted_softmax.view(batch_size, output_lengths, -1).squeeze(1)
+        # Criterions apply log-softmax to logits themselves, so only inference pays for it here
+        output = output.float() if self.training else F.log_softmax(output.float(), dim=-1)
+        step_output = output.view(batch_size, output_lengths, -1).squeeze(1)
 
         return step_output, hidden, attn
 
-    def forward(self, inputs: Tensor, encoder_outputs: Tensor, teacher_forcing_ratio: float = 1.0,
+    def forward(self, inputs: Tensor, encoder_outputs: Tensor, use_teacher_forcing: bool = True,
                 language_model: Optional[nn.Module] = None) -> Tuple[Tensor, dict]:
-        hidden, attn = None, None
-        decoder_outputs, ret_dict = list(), dict()
+        ret_dict = dict()
+
+        # Once per batch instead of at every forward_step() (nn.DataParallel replicas are not flattened)
+        self.rnn.flatten_parameters()
 
         if not self.training:
             ret_dict[Speller.KEY_ATTENTION_SCORE] = list()
             ret_dict[Speller.KEY_SEQUENCE_SYMBOL] = list()
 
-        inputs, batch_size, max_length = self.validate_args(inputs, encoder_outputs, teacher_forcing_ratio, language_model)
-        use_teacher_forcing = True if random.random() < teacher_forcing_ratio else False
+        inputs, batch_size, max_length = self.validate_args(inputs, encoder_outputs, use_teacher_forcing, language_model)
+
+        hidden, attn = self._init_state(batch_size, encoder_outputs)
+
         use_language_model = True if language_model is not None else False
 
         if use_teacher_forcing:
-            inputs = inputs[inputs != self.eos_id].view(batch_size, -1)
+            # Drop the last column instead of masking out eos. For shorter sequences this keeps eos in place of
+            # a trailing pad, but its output is aligned with a pad target, which the criterion ignores.
+            inputs = inputs[:, :-1]
 
             # Call forward_step() at every timestep when attention mechanism is location-aware
             # Because location-aware attention requires previous attention (alignment).
             if self.attn_mechanism == 'loc':
-                for di in range(inputs.size(1)):
-                    input_var = inputs[:, di].unsqueeze(1)
-                    step_output, hidden, attn = self.forward_step(input_var, hidden, encoder_outputs, attn)
-                    decoder_outputs.append(step_output)
+                decoder_outputs = self._decode_location_aware(inputs, hidden, encoder_outputs, attn)
 
             else:
-                step_outputs, hidden, attn = self.forward_step(inputs, hidden, encoder_outputs, attn)
+                decoder_outputs, hidden, attn = self.forward_step(inputs, hidden, encoder_outputs, attn)
 
-                for di in range(step_outputs.size(1)):
-                    step_output = step_outputs[:, di, :]
-                    decoder_outputs.append(step_output)
+        elif not self.training and not use_language_model and encoder_outputs.is_cuda:
+            input_var = inputs[:, 0].unsqueeze(1)
+            memory = self._project_memory(encoder_outputs)
+            decoder_outputs = self._decode_with_cuda_graph(input_var, hidden, memory, attn, max_length, ret_dict)
 
         else:
             input_var = inputs[:, 0].unsqueeze(1)
-            prev_tokens = input_var.clone() if use_language_model else None
+            memory = self._project_memory(encoder_outputs)
+            decoder_outputs = self._decode_greedy(input_var, hidden, memory, attn, max_length, ret_dict, language_model)
 
-            for di in range(max_length):
-                step_output, hidden, attn = self.forward_step(input_var, hidden, encoder_outputs, attn)
+        return decoder_outputs, ret_dict
 
-                if not self.training:
-                    ret_dict[Speller.KEY_ATTENTION_SCORE].append(attn)
-                    ret_dict[Speller.KEY_SEQUENCE_SYMBOL].append(input_var)
+    @torch.compiler.disable
+    def _decode_location_aware(self, inputs: Tensor, hidden: Any, encoder_outputs: Tensor, attn: Tensor) -> Tensor:
+        """
+        Teacher forcing for location-aware attention, one forward_step() per timestep.
+        Step-by-step loops run eagerly under torch.compile: nn.LSTM breaks the graph at every step,
+        and the step fragments would recompile for every target length until dynamo gives up on them.
+        """
+        batch_size = inputs.size(0)
+        embedded = self.input_dropout(self.embedding(inputs))
+        decoder_outputs = encoder_outputs.new_empty(batch_size, inputs.size(1), self.num_classes, dtype=torch.float)
+
+        for di in range(inputs.size(1)):
+            embedded_var = embedded[:, di:di + 1]
+            step_output, hidden, attn = self.embedded_step(embedded_var, hidden, encoder_outputs, attn)
+            decoder_outputs[:, di] = step_output
+
+        return decoder_outputs
+
+    @torch.compiler.disable
+    def _decode_greedy(self, input_var: Tensor, hidden: Any, memory: Any, attn: Tensor, max_length: int,
+                       ret_dict: dict, language_model: Optional[nn.Module]) -> Tensor:
+        """ Greedy decoding from the previous step's output, eager under torch.compile (see _decode_location_aware) """
+        batch_size = input_var.size(0)
+        use_language_model = language_model is not None
+        prev_tokens = input_var.clone() if use_language_model else None
+
+        decoder_outputs = torch.empty(batch_size, max_length, self.num_classes, device=attn.device)
+        done = input_var.new_zeros(batch_size, dtype=torch.bool)
+
+        for di in range(max_length):
+            step_output, hidden, attn = self.forward_step(input_var, hidden, memory, attn)
+
+            if not self.training:
+                ret_dict[Speller.KEY_ATTENTION_SCORE].append(attn)
+                ret_dict[Speller.KEY_SEQUENCE_SYMBOL].append(input_var)
+
+                if use_language_model:
+                    lm_step_output = language_model.forward_step(prev_tokens, None)[0][:, -1, :].squeeze(1)
+                    step_output = step_output * self.acoustic_weight + lm_step_output * self.language_weight
+                    prev_tokens = torch.cat([prev_tokens, step_output.topk(1)[1]], dim=1)
+
+            decoder_outputs[:, di] = step_output
+            input_var = step_output.topk(1)[1]
+
+            if not self.training:
+                done |= input_var.squeeze(1) == self.eos_id
+                if done.all():
+                    # keep full length, nn.DataParallel gathers outputs of equal shape from every replica
+                    decoder_outputs[:, di + 1:] = step_output.unsqueeze(1)
+                    break
+
+        return decoder_outputs
+
+    def _init_state(self, batch_size: int, encoder_outputs: Tensor) -> Tuple[Any, Tensor]:
+        """
+        Returns all-zero initial hidden state & attention instead of None, so that forward_step() always sees
+        tensors of the same kind (torch.compile guards on None and would recompile, then fall back to eager).
+        """
+        hidden = encoder_outputs.new_zeros(self.rnn.num_layers, batch_size, self.hidden_dim)
+
+        if isinstance(self.rnn, nn.LSTM):
+            hidden = (hidden, torch.zeros_like(hidden))
+
+        if self.attn_mechanism == 'loc':
+            attn = encoder_outputs.new_zeros(batch_size, encoder_outputs.size(1))
+        else:
+            attn = encoder_outputs.new_zeros(batch_size * self.num_heads, 1, encoder_outputs.size(1))
 
-                    if use_language_model:
-                        lm_step_output = language_model.forward_step(prev_tokens, None)[0][:, -1, :].squeeze(1)
-                        step_output = step_output * self.acoustic_weight + lm_step_output * self.language_weight
-                        prev_tokens = torch.cat([prev_tokens, step_output.topk(1)[1]], dim=1)
+        return hidden, attn
 
-                decoder_outputs.append(step_output)
-                input_var = decoder_outputs[-1].topk(1)[1]
+    def _project_memory(self, encoder_outputs: Tensor) -> Any:
+        """
+        Returns what forward_step() attends to at every decoding step. For dot-product attention, key & value
+        are projected once per utterance instead of once per step, and cached in bfloat16 for inference.
+        """
+        if self.attn_mechanism != 'dot':
+            return encoder_outputs
 
-        return decoder_outputs, ret_dict
+        key, value = self.attention.project_key_value(encoder_outputs, encoder_outputs)
+
+        if not self.training and encoder_outputs.is_cuda and _bf16_supported():
+            key, value = key.to(torch.bfloat16), value.to(torch.bfloat16)
+
+        return key, value
+
+    @torch.compiler.disable
+    def _decode_with_cuda_graph(self, input_var: Tensor, hidden: Any, memory: Any, attn: Tensor,
+                                max_length: int, ret_dict: dict) -> Tensor:
+        """
+        Greedy decoding which captures forward_step() as a CUDA graph once and replays it at every timestep,
+        instead of launching every kernel of the step from python. The first step runs eagerly,
+        so that decoding can stop before capture when every sequence emits eos right away.
+        """
+        batch_size = input_var.size(0)
+        decoder_outputs = torch.empty(batch_size, max_length, self.num_classes, device=input_var.device)
+
+        step_output, hidden, attn = self.forward_step(input_var, hidden, memory, attn)
+        ret_dict[Speller.KEY_ATTENTION_SCORE].append(attn)
+        ret_dict[Speller.KEY_SEQUENCE_SYMBOL].append(input_var)
+        decoder_outputs[:, 0] = step_output
+
+        static_input, static_hidden, static_attn = step_output.topk(1)[1], hidden, attn
+        done = static_input.squeeze(1) == self.eos_id
+
+        if max_length == 1 or done.all():
+            decoder_outputs[:, 1:] = step_output.unsqueeze(1)
+            return decoder_outputs
+
+        graph, static_input, static_hidden, memory, static_attn, static_output, next_hidden, next_attn = \
+            self._get_cuda_graph(static_input, static_hidden, memory, static_attn)
+
+        for di in range(1, max_length):
+            graph.replay()
+
+            ret_dict[Speller.KEY_ATTENTION_SCORE].append(next_attn.clone())
+            ret_dict[Speller.KEY_SEQUENCE_SYMBOL].append(static_input.clone())
+            decoder_outputs[:, di] = static_output
+
+            static_input.copy_(static_output.topk(1)[1])
+            done |= static_input.squeeze(1) == self.eos_id
+
+            if done.all():
+                decoder_outputs[:, di + 1:] = static_output.unsqueeze(1)
+                break
+
+            static_attn.copy_(next_attn)
+
+            if isinstance(static_hidden, tuple):
+                for h, next_h in zip(static_hidden, next_hidden):
+                    h.copy_(next_h)
+            else:
+                static_hidden.copy_(next_hidden)
+
+        return decoder_outputs
+
+    def _get_cuda_graph(self, input_var: Tensor, hidden: Any, memory: Any, attn: Tensor) -> tuple:
+        """
+        Returns a CUDA graph of forward_step() with its static input & output buffers, after copying the given
+        inputs into them. Graphs are cached per batch shape, so later batches of the same shape only replay.
+        """
+        tensors = memory if isinstance(memory, tuple) else (memory,)
+        # a graph reads parameters from the addresses they had at capture, e.g. model.to() moves them
+        key = (input_var.size(0), tensors[0].size(1), tensors[0].dtype, self.attn_mechanism, input_var.device,
+               tuple(param.data_ptr() for param in self.parameters()))
+
+        # nn.DataParallel replicas get new parameters at every forward, and share the original's cache
+        use_cache = not getattr(self, '_is_replica', False)
+
+        if use_cache and key in self._cuda_graphs:
+            self._cuda_graphs.move_to_end(key)
+            entry = self._cuda_graphs[key]
+            _copy_states(entry[1:5], (input_var, hidden, memory, attn))
+            return entry
+
+        # static buffers are owned by the graph, the caller's tensors are only copied into them
+        input_var, hidden, memory, attn = _clone_states((input_var, hidden, memory, attn))
+
+        # torch.cuda.graph() requires warming up on a side stream before capture
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            self.forward_step(input_var, hidden, memory, attn)
+        torch.cuda.current_stream().wait_stream(stream)
+
+        # thread_local: nn.DataParallel runs replicas concurrently in other threads
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph, capture_error_mode='thread_local'):
+            step_output, next_hidden, next_attn = self.forward_step(input_var, hidden, memory, attn)
+
+        entry = (graph, input_var, hidden, memory, attn, step_output, next_hidden, next_attn)
+
+        if use_cache:
+            self._cuda_graphs[key] = entry
+            if len(self._cuda_graphs) > Speller.MAX_CUDA_GRAPHS:
+                self._cuda_graphs.popitem(last=False)
+
+        return entry
 
     def validate_args(self, inputs: Optional[Any], encoder_outputs: Tensor,
-                      teacher_forcing_ratio: float, language_model: Optional[nn.Module]) -> Tuple[Tensor, int, int]:
+                      use_teacher_forcing: bool, language_model: Optional[nn.Module]) -> Tuple[Tensor, int, int]:
         """ Validate arguments """
         batch_size = encoder_outputs.size(0)
 
@@ -160,8 +365,8 @@ class Speller(BaseRNN):
             if torch.cuda.is_available():
                 inputs = inputs.cuda()
 
-            if teacher_forcing_ratio > 0:
-                raise ValueError("Teacher forcing has to be disabled (set 0) when no inputs is provided.")
+            if use_teacher_forcing:
+                raise ValueError("Teacher forcing has to be disabled when no inputs is provided.")
 
         else:
             max_length = inputs.size(1) - 1  # minus the start of sequence symbol
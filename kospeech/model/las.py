@@ -12,19 +12,20 @@ class ListenAttendSpell(nn.Module):
         listener (torch.nn.Module): encoder of seq2seq
         speller (torch.nn.Module): decoder of seq2seq
 
-    Inputs: inputs, input_lengths, targets, teacher_forcing_ratio
+    Inputs: inputs, input_lengths, targets, use_teacher_forcing
         - **inputs** (torch.Tensor): tensor of sequences, whose length is the batch size and within which
           each sequence is a list of token IDs. This information is forwarded to the encoder.
         - **input_lengths** (torch.Tensor): tensor of sequences, whose contains length of inputs.
         - **targets** (torch.Tensor): tensor of sequences, whose length is the batch size and within which
           each sequence is a list of token IDs. This information is forwarded to the decoder.
-        - **teacher_forcing_ratio** (float): The probability that teacher forcing will be used. A random number
-          is drawn uniformly from 0-1 for every decoding token, and if the sample is smaller than the given value,
-          teacher forcing would be used (default is 0.90)
+        - **use_teacher_forcing** (bool): flag indication whether to use teacher forcing or not. The caller samples
+          it with teacher forcing ratio (e.g. SupervisedTrainer, once per batch). (default: True)
 
-    Returns: output
-        - **output** (seq_len, batch_size, num_classes): list of tensors containing
-          the outputs of the decoding function.
+    Returns: output, ret_dict
+        - **output** (batch, seq_len, num_classes): tensor containing the outputs of the decoding function.
+          Outputs are logits in training mode and log probabilities in evaluation mode.
+        - **ret_dict**: dictionary containing additional information of the speller (attention scores and
+          predicted token IDs in evaluation mode).
 
     Reference:
         - **Listen Attend and Spell**: https://arxiv.org/abs/1508.01211
@@ -35,9 +36,9 @@ class ListenAttendSpell(nn.Module):
         self.speller = speller
 
     def forward(self, inputs: Tensor, input_lengths: Tensor, targets: Optional[Tensor] = None,
-                teacher_forcing_ratio: float = 1.0, language_model: Optional[nn.Module] = None) -> Tuple[Tensor, dict]:
+                use_teacher_forcing: bool = True, language_model: Optional[nn.Module] = None) -> Tuple[Tensor, dict]:
         encoder_outputs = self.listener(inputs, input_lengths)
-        result = self.speller(targets, encoder_outputs, teacher_forcing_ratio, language_model)
+        result = self.speller(targets, encoder_outputs, use_teacher_forcing, language_model)
         return result
 
     def flatten_parameters(self):
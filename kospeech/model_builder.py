@@ -46,6 +46,21 @@ def build_las(listener, speller, device, init_uniform=True):
     return model
 
 
+def compile_model(model):
+    """
+    Compiles ListenAttendSpell.forward() with torch.compile in place, so checkpoints still pickle the plain module.
+    nn.DataParallel replicas would share the compiled function bound to the original module,
+    so compilation is supported on a single device only.
+    """
+    if isinstance(model, nn.DataParallel) and len(model.device_ids) > 1:
+        raise ParameterError("torch.compile is not supported with multiple gpus")
+
+    las = model.module if isinstance(model, nn.DataParallel) else model
+    las.compile(dynamic=True)
+
+    return model
+
+
 def build_listener(input_size, hidden_dim, dropout_p, num_layers, bidirectional,
                    rnn_type, extractor, activation, device, mask_conv):
     """ Various encoder dispatcher function. """
@@ -130,9 +145,28 @@ def load_test_model(opt, device):
         model.speller.device = device
         model.listener.device = device
 
+    if opt.quantize:
+        if str(device) != 'cpu':
+            raise ParameterError("int8 quantization is supported only for cpu inference")
+
+        las = model.module if isinstance(model, nn.DataParallel) else model
+        las.set_speller(quantize_speller(las.speller))
+
     return model
 
 
+def quantize_speller(speller):
+    """
+    Quantizes linear layers & embedding of speller to int8 for cpu inference.
+    Linear layers are quantized dynamically (activations are quantized on the fly), embedding weight only.
+    """
+    speller.eval()
+    return torch.ao.quantization.quantize_dynamic(speller, {
+        nn.Linear: torch.ao.quantization.default_dynamic_qconfig,
+        nn.Embedding: torch.ao.quantization.float_qparams_weight_only_qconfig
+    })
+
+
 def load_language_model(path, device):
     model = torch.load(path, map_location=lambda storage, loc: storage).to(device)
 
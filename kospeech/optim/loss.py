@@ -2,6 +2,7 @@ import math
 import numpy as np
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
 
 class LabelSmoothingLoss(nn.Module):
@@ -16,7 +17,7 @@ class LabelSmoothingLoss(nn.Module):
         dim (int): dimention of calculation loss
 
     Inputs: logit, target
-        logit (torch.Tensor): probability distribution value from model and it has a logarithm shape
+        logit (torch.Tensor): unnormalized scores (logits) from model
         target (torch.Tensor): ground-thruth encoded to integers which directly point a word in label
 
     Returns: label_smoothed
@@ -31,6 +32,8 @@ class LabelSmoothingLoss(nn.Module):
         self.ignore_index = ignore_index
 
     def forward(self, logit, target):
+        logit = F.log_softmax(logit, dim=self.dim)
+
         with torch.no_grad():
             label_smoothed = torch.zeros_like(logit)
             label_smoothed.fill_(self.smoothing / (self.num_classes - 1))
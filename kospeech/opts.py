@@ -135,6 +135,9 @@ def build_train_opts(parser):
     group.add_argument('--resume', '-resume',
                        action='store_true', default=False,
                        help='Indicates if training has to be resumed from the latest checkpoint')
+    group.add_argument('--use_compile', '-use_compile',
+                       action='store_true', default=False,
+                       help='flag indication whether to compile model with torch.compile or not (single gpu only)')
 
 
 def build_preprocess_opts(parser):
@@ -163,7 +166,11 @@ def build_preprocess_opts(parser):
                        help='flag indication whether to reverse input or not')
     group.add_argument('--feature_extract_by', '-feature_extract_by',
                        type=str, default='librosa',
-                       help='which library to use for feature extraction: [librosa, torchaudio] (default: librosa)')
+                       help='which library to use for feature extraction: '
+                            '[librosa, torchaudio, nnaudio (mfcc only)] (default: librosa)')
+    group.add_argument('--feature_on_gpu', '-feature_on_gpu',
+                       action='store_true', default=False,
+                       help='flag indication whether to extract torchaudio / nnaudio features on gpu or not')
     group.add_argument('--feature', '-feature',
                        type=str, default='mel',
                        help='which feature to use: [mel, spect] (default: mel)')
@@ -214,6 +221,9 @@ def build_eval_opts(parser):
     group.add_argument('--print_every', '-print_every',
                        type=int, default=10,
                        help='to determine whether to store inference progress every N timesteps (default: 10')
+    group.add_argument('--quantize', '-quantize',
+                       action='store_true', default=False,
+                       help='flag indication whether to quantize speller to int8 for cpu inference or not')
 
 
 def print_preprocess_opts(opt):
@@ -228,6 +238,7 @@ def print_preprocess_opts(opt):
     logger.info('--del_silence: %s' % str(opt.del_silence))
     logger.info('--input_reverse: %s' % str(opt.input_reverse))
     logger.info('--feature_extract_by: %s' % str(opt.feature_extract_by))
+    logger.info('--feature_on_gpu: %s' % str(opt.feature_on_gpu))
     logger.info('--time_mask_para: %s' % str(opt.time_mask_para))
     logger.info('--freq_mask_para: %s' % str(opt.freq_mask_para))
     logger.info('--time_mask_num: %s' % str(opt.time_mask_num))
@@ -281,6 +292,7 @@ def print_train_opts(opt):
     logger.info('--checkpoint_every: %s' % str(opt.checkpoint_every))
     logger.info('--print_every: %s' % str(opt.print_every))
     logger.info('--resume: %s' % str(opt.resume))
+    logger.info('--use_compile: %s' % str(opt.use_compile))
 
 
 def print_eval_opts(opt):
@@ -295,6 +307,7 @@ def print_eval_opts(opt):
     logger.info('--decode: %s' % str(opt.decode))
     logger.info('--k: %s' % str(opt.k))
     logger.info('--print_every: %s' % str(opt.print_every))
+    logger.info('--quantize: %s' % str(opt.quantize))
 
 
 def print_opts(opt, mode='train'):
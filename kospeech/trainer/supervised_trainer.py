@@ -2,6 +2,7 @@ import math
 import time
 import torch
 import queue
+import torch.nn as nn
 import pandas as pd
 from kospeech.checkpoint.checkpoint import Checkpoint
 from kospeech.optim.lr_scheduler import ExponentialDecayLR
@@ -24,6 +25,7 @@ class SupervisedTrainer(object):
         print_every (int): number of timesteps to print result after
         save_result_every (int): number of timesteps to save result after
         checkpoint_every (int): number of timesteps to checkpoint after
+        seed (int): seed of generator which samples whether to use teacher forcing at every timestep
     """
     train_dict = {'loss': [], 'cer': []}
     valid_dict = {'loss': [], 'cer': []}
@@ -35,7 +37,7 @@ class SupervisedTrainer(object):
     def __init__(self, optimizer, criterion, trainset_list, validset, high_plateau_lr, low_plateau_lr,
                  exp_decay_period, num_workers, device, decay_threshold,
                  print_every, save_result_every, checkpoint_every,
-                 teacher_forcing_step=0.0, min_teacher_forcing_ratio=0.7):
+                 teacher_forcing_step=0.0, min_teacher_forcing_ratio=0.7, seed=7):
         self.num_workers = num_workers
         self.optimizer = optimizer
         self.criterion = criterion
@@ -52,6 +54,7 @@ class SupervisedTrainer(object):
         self.teacher_forcing_step = teacher_forcing_step
         self.min_teacher_forcing_ratio = min_teacher_forcing_ratio
         self.metric = CharacterErrorRate(id2char, EOS_token)
+        self.generator = torch.Generator().manual_seed(seed)
 
     def train(self, model, batch_size, epoch_time_step, num_epochs, teacher_forcing_ratio=0.99, resume=False):
         """
@@ -75,6 +78,12 @@ class SupervisedTrainer(object):
             model = resume_checkpoint.model
             self.optimizer = resume_checkpoint.optimizer
             self.criterion = resume_checkpoint.criterion
+            if isinstance(self.criterion, nn.NLLLoss):
+                # Older checkpoints hold NLLLoss, but Speller now returns logits in training mode
+                self.criterion = nn.CrossEntropyLoss(
+                    ignore_index=self.criterion.ignore_index,
+                    reduction=self.criterion.reduction
+                ).to(self.device)
             self.trainset_list = resume_checkpoint.trainset_list
             self.validset = resume_checkpoint.validset
             start_epoch = resume_checkpoint.epoch
@@ -99,6 +108,11 @@ class SupervisedTrainer(object):
                                                        train_queue, teacher_forcing_ratio)
             train_loader.join()
 
+            # Loader threads are done, so spectrogram scratch buffers, sized for the longest batch the loaders saw,
+            # can be released (before the checkpoint pickles the datasets)
+            for trainset in self.trainset_list:
+                trainset.reset_buffers()
+
             Checkpoint(model, self.optimizer, self.criterion, self.trainset_list, self.validset, epoch).save()
             logger.info('Epoch %d (Training) Loss %0.4f CER %0.4f' % (epoch, train_loss, train_cer))
 
@@ -123,6 +137,7 @@ class SupervisedTrainer(object):
 
             valid_cer = self.validate(model, valid_queue)
             valid_loader.join()
+            self.validset.reset_buffers()
 
             logger.info('Epoch %d (Validate) Loss %0.4f CER %0.4f' % (epoch, 1.0, valid_cer))
             self._save_epoch_result(train_result=[self.train_dict, train_loss, train_cer],
@@ -173,11 +188,13 @@ class SupervisedTrainer(object):
             scripts = scripts.to(self.device)
             targets = scripts[:, 1:]
 
+            use_teacher_forcing = torch.rand(1, generator=self.generator).item() < teacher_forcing_ratio
+
             model.module.flatten_parameters()
             output = model(inputs=inputs, input_lengths=input_lengths,
-                           targets=scripts, teacher_forcing_ratio=teacher_forcing_ratio)[0]
+                           targets=scripts, use_teacher_forcing=use_teacher_forcing)[0]
 
-            logit = torch.stack(output, dim=1).to(self.device)
+            logit = output.to(self.device)
             hypothesis = logit.max(-1)[1]
 
             loss = self.criterion(logit.contiguous().view(-1, logit.size(-1)), targets.contiguous().view(-1))
@@ -250,9 +267,9 @@ class SupervisedTrainer(object):
                 targets = scripts[:, 1:]
 
                 model.module.flatten_parameters()
-                output = model(inputs=inputs, input_lengths=input_lengths, teacher_forcing_ratio=0.0)[0]
+                output = model(inputs=inputs, input_lengths=input_lengths, use_teacher_forcing=False)[0]
 
-                logit = torch.stack(output, dim=1).to(self.device)
+                logit = output.to(self.device)
                 hypothesis = logit.max(-1)[1]
 
                 cer = self.metric(targets, hypothesis)